@@ -1,6 +1,36 @@
-from PIL import Image, ImageChops
+from PIL import Image
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of image rows compared at a time; a strip of a 4000 pixel wide RGB image is ~750 KB, which fits in L2
+TILE_ROWS = 64
+
+# Smallest image (in pixels) whose strips are spread over the thread pool. Below it, handing the strips to
+# the pool costs more than comparing them (a 100x200 image is compared in well under 0.1 ms on one core)
+PARALLEL_MIN_PIXELS = 1_000_000
+
+# Thread pool shared by all comparisons, created on first use (see get_strip_executor)
+STRIP_EXECUTOR = None
+
+# zlib compression level of the saved difference images (1 is the fastest)
+PNG_COMPRESS_LEVEL = 1
+
+# Image modes converted at load time: palette indices to RGB colors, 1-bit pixels to 8-bit grayscale
+LOAD_MODE_CONVERSIONS = {'P': 'RGB', '1': 'L'}
+
+"""
+    Description:
+        Returns the thread pool the row strips of large images are compared on. It is created once, on
+        first use, and shared by all comparisons instead of starting new threads on every call.
+    Returns:
+        concurrent.futures.ThreadPoolExecutor: The shared thread pool, with one thread per CPU.
+"""
+def get_strip_executor():
+    global STRIP_EXECUTOR
+    if STRIP_EXECUTOR is None:
+        STRIP_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count())
+    return STRIP_EXECUTOR
 
 """
 Class for handling image comparison using pixel-by-pixel comparison with a tolerance threshold.
@@ -9,23 +39,34 @@ class ImageCompare:
     """
     Description:
         Initializes the ImageCompare class with image paths and a tolerance value.
+        The decoded pixels of both images are cached as NumPy arrays so that they are
+        only copied out of PIL once.
     Args:
-        img1_path (str): Path to the first image.
-        img2_path (str): Path to the second image.
+        img1_path (str or PIL.Image): Path to the first image, or the already opened image.
+        img2_path (str or PIL.Image): Path to the second image, or the already opened image.
         tolerance (float): Tolerance percentage for pixel comparison.
+        output_dir (str): The directory the difference images are saved to. It is created on the
+                          first save into it, once, instead of on every save.
     """
-    def __init__(self, img1_path, img2_path, tolerance):
+    def __init__(self, img1_path, img2_path, tolerance, output_dir="../tests/testcase_output"):
         self.img1_path = img1_path
         self.img2_path = img2_path
         self.tolerance = tolerance
+        self.output_dir = output_dir
+        self.output_dir_created = False  # Set once output_dir has been created by save_difference_images
         self.img1 = self.load_image(self.img1_path)
         self.img2 = self.load_image(self.img2_path)
+        self.img1_arr = np.asarray(self.img1)
+        self.img2_arr = np.asarray(self.img2)
+        self.pixel_diff = None  # Per-pixel difference, computed by the first compare_images call
     
     """
     Description:
-        Loads an image from the given file path.
+        Loads an image from the given file path and decodes its pixel data.
+        An already opened PIL image is decoded in place instead of being opened again.
+        Palette and 1-bit images are converted to RGB and grayscale respectively.
     Args:
-        image_path (str): The path to the image file.
+        image_path (str or PIL.Image): The path to the image file, or the opened image.
     Returns:
         PIL.Image: The loaded image.
     Raises:
@@ -34,9 +75,16 @@ class ImageCompare:
     @staticmethod
     def load_image(image_path):
         try:
-            return Image.open(image_path)
+            image = image_path if isinstance(image_path, Image.Image) else Image.open(image_path)
+            image.load()  # Decode now so that truncated files are reported here
+            # Convert modes whose raw pixel values are not intensities (palette, 1-bit) once, here,
+            # so the cached arrays can be compared and saved without any later mode conversion
+            if image.mode in LOAD_MODE_CONVERSIONS:
+                image = image.convert(LOAD_MODE_CONVERSIONS[image.mode])
+            return image
         except Exception as e:
-            raise ValueError(f"Error loading image '{image_path}': {str(e)}")
+            image_name = getattr(image_path, "filename", image_path)  # Report opened images by their file name
+            raise ValueError(f"Error loading image '{image_name}': {str(e)}")
         
     """
     Description:
@@ -50,82 +98,248 @@ class ImageCompare:
         if self.img1.mode != self.img2.mode:
             raise ValueError(f"Image modes do not match: {self.img1.mode} vs {self.img2.mode}")
 
+    """
+    Description:
+        Returns the dtype the per-pixel differences of the loaded images are stored in. This is the images'
+        own dtype, except for signed integers: max(a, b) - min(a, b) can exceed their largest value (e.g. for
+        int32 'I' images holding 2147483647 and -2147483648), but the wrapped-around result is exact when it
+        is read as the unsigned integer of the same width, so those differences are stored unsigned.
+    Returns:
+        numpy.dtype: The dtype of the per-pixel differences.
+    """
+    def difference_dtype(self):
+        dtype = self.img1_arr.dtype
+        if np.issubdtype(dtype, np.signedinteger):
+            return np.dtype(f"u{dtype.itemsize}")
+        return dtype
+
     """
     Description:
         Compares the two loaded images pixel by pixel, using the given tolerance value.
+        The per-pixel difference does not depend on the tolerance, so the first call that builds a mask
+        keeps it in pixel_diff; later calls (e.g. after changing self.tolerance) only redo the threshold.
+    Args:
+        return_mask (bool): Whether to build and return the HxW mask of the differences. Callers that
+                            only need the counts can pass False: each strip is then compared, thresholded
+                            and counted in strip-sized buffers, so no HxW array is allocated or kept
+                            (a pixel_diff kept by an earlier call is still reused).
     Returns:
-        tuple: A tuple containing a mask of the differences, the number of differing pixels,
-               and the total number of pixels.
+        tuple: A tuple containing a mask of the differences (None if return_mask is False),
+               the number of differing pixels, and the total number of pixels.
     """
-    def compare_images(self):
+    def compare_images(self, return_mask=True):
         self.validate_images()
-        
-        # Calculate pixel-wise difference using ImageChops.difference()
-        diff_image = ImageChops.difference(self.img1, self.img2)
-    
-        # Convert the difference image to a NumPy array
-        diff_array = np.array(diff_image)
-        
-        #  Calculate tolerance value from the tolerance percentage
+
+        #  Calculate tolerance value from the tolerance percentage (float images are compared against it as it is)
         tolerance_value = (self.tolerance / 100) * 255
-        
-        # For RGB images, the difference is in 3 channels, so we apply tolerance across all channels
-        if self.img1.mode == "RGB":
-            # Apply the tolerance threshold: mask the pixels where any channel exceeds the tolerance
-            # Axis = -1  refers to the last axis, which in the case of an RGB image is the color channels (R, G, B)
-            # This operation checks for each pixel if any of the three color channels (R, G, or B) have a difference greater than the tolerance
-            mask = np.any(diff_array > tolerance_value, axis=-1)
+        dtype = self.difference_dtype()
+        if np.issubdtype(dtype, np.integer):
+            # Pixel differences are integers, so "difference > 12.75" is the same test as "difference > 12".
+            # Keeping the threshold in the differences' dtype (e.g. uint8) lets NumPy compare in that dtype instead
+            # of upcasting the array to float64. It is clamped to the dtype's range: no difference exceeds the
+            # largest value (tolerances above 100% on 8-bit images), and a negative tolerance counts as 0
+            tolerance_value = dtype.type(min(max(int(tolerance_value), 0), np.iinfo(dtype).max))
+
+        # Process the images in strips of TILE_ROWS rows, so the intermediate difference arrays of a
+        # strip stay in the CPU cache instead of streaming full-image temporaries through memory
+        height, width = self.img1_arr.shape[:2]
+        compute_diff = self.pixel_diff is None
+        # The difference keeps the dtype of the images (unsigned for signed integer images, see difference_dtype),
+        # so that 16-bit, 32-bit and float images do not wrap around. It is only allocated (and kept) for
+        # calls that build a mask; counting alone computes it strip by strip into strip-sized buffers
+        if not compute_diff:
+            pixel_diff = self.pixel_diff
+        elif return_mask:
+            pixel_diff = np.empty((height, width), dtype=dtype)
         else:
-            # For grayscale images, the difference is just 1 channel, so apply the threshold directly
-            mask = diff_array > tolerance_value
-    
-        # Calculate the number of differing pixels and the total number of pixels
-        total_pixels = np.prod(self.img1.size)
-        num_differences = np.sum(mask)
+            pixel_diff = None
+        # Each call returns its own mask, so masks returned by earlier calls stay valid
+        mask = np.empty((height, width), dtype=bool) if return_mask else None
+        starts = range(0, height, TILE_ROWS)
+
+        def compare_strip(start):
+            return self.compare_rows(start, min(start + TILE_ROWS, height), tolerance_value,
+                                     pixel_diff, mask, compute_diff)
+
+        # The strips are independent and NumPy releases the GIL inside its ufuncs, so the strips of large
+        # images are spread over the shared thread pool when there is more than one CPU. Small images are
+        # compared in this thread, where they finish faster than the pool could hand out their strips
+        if (os.cpu_count() or 1) > 1 and len(starts) > 1 and height * width >= PARALLEL_MIN_PIXELS:
+            strip_differences = list(get_strip_executor().map(compare_strip, starts))
+        else:
+            strip_differences = [compare_strip(start) for start in starts]
+
+        # Keep the per-pixel difference only once every strip of it has been computed
+        if pixel_diff is not None:
+            self.pixel_diff = pixel_diff
+
+        # Calculate the number of differing pixels (counted per strip) and the total number of pixels
+        total_pixels = height * width
+        num_differences = sum(strip_differences)
     
         return mask, num_differences, total_pixels
     
+    """
+    Description:
+        Compares the rows [start, stop) of the two loaded images, writes the result into the
+        matching rows of the mask and counts the differing pixels while the strip is still in cache.
+        Without a mask, the strip is thresholded into a strip-sized buffer that is only counted, and
+        without pixel_diff its difference is computed into a strip-sized buffer as well.
+    Args:
+        start (int): The first row to compare.
+        stop (int): The row after the last row to compare.
+        tolerance_value (numpy.generic or float): Highest pixel difference still considered equal.
+        pixel_diff (numpy.ndarray or None): HxW array (of difference_dtype) holding the largest channel difference
+                                            of each pixel, or None to only compute it for these rows.
+        mask (numpy.ndarray or None): The HxW boolean mask to write into, or None to only count.
+        compute_diff (bool): Whether these rows of pixel_diff still have to be computed from the images.
+    Returns:
+        int: The number of differing pixels in these rows.
+    """
+    def compare_rows(self, start, stop, tolerance_value, pixel_diff, mask, compute_diff):
+        if pixel_diff is not None:
+            diff_rows = pixel_diff[start:stop]
+        else:
+            diff_rows = np.empty((stop - start, self.img1_arr.shape[1]), dtype=self.difference_dtype())
+        if compute_diff:
+            img1_rows = self.img1_arr[start:stop]
+            img2_rows = self.img2_arr[start:stop]
+
+            # Identical strips (common when comparing identical or nearly identical images) are detected with a
+            # plain equality check, which costs a fraction of the difference computation below
+            if np.array_equal(img1_rows, img2_rows):
+                diff_rows.fill(0)
+                if mask is not None:
+                    mask[start:stop] = False
+                return 0
+
+            # For RGB images, the difference has one value per channel, so we apply tolerance across all channels
+            if img1_rows.ndim == 3:
+                # Calculate the pixel-wise absolute difference on the cached arrays.
+                # max(a, b) - min(a, b) is never negative, so it stays in the images' dtype (e.g. uint8) without
+                # widening; for signed integers it is read as unsigned, where the wrapped-around result is exact
+                diff_array = np.maximum(img1_rows, img2_rows)
+                diff_array -= np.minimum(img1_rows, img2_rows)
+                diff_array = diff_array.view(diff_rows.dtype)
+
+                # A pixel differs if any of its channels exceeds the tolerance, which is the same as its largest
+                # channel difference exceeding it. The channels (R, G, B) are combined with element-wise np.maximum
+                # into a single 2-D array, so only one threshold pass is needed and no boolean mask per channel is built
+                # (a .max(axis=-1) reduction over a 3-element axis is much slower than these element-wise passes)
+                np.maximum(diff_array[..., 0], diff_array[..., 1], out=diff_rows)
+                for channel in range(2, diff_array.shape[-1]):
+                    np.maximum(diff_rows, diff_array[..., channel], out=diff_rows)
+            else:
+                # For grayscale images, the difference is just 1 channel, so it is written directly. It is computed
+                # through a view in the images' dtype (same width as diff_rows, so no copy is made): for signed
+                # integers the subtraction wraps around, and reading it back as unsigned gives the exact difference
+                diff_view = diff_rows.view(img1_rows.dtype)
+                np.maximum(img1_rows, img2_rows, out=diff_view)
+                diff_view -= np.minimum(img1_rows, img2_rows)
+
+        mask_rows = mask[start:stop] if mask is not None else np.empty(diff_rows.shape, dtype=bool)
+        np.greater(diff_rows, tolerance_value, out=mask_rows)
+
+        # np.count_nonzero has a dedicated fast path for boolean arrays, unlike np.sum
+        return int(np.count_nonzero(mask_rows))
+
+    """
+    Description:
+        Returns the RGB pixel array of an image. Pixel arrays that are already 8-bit RGB or grayscale
+        (such as the cached img1_arr/img2_arr of RGB and L images, see cached_array) are used as they are
+        instead of being copied.
+        Any other image or array (e.g. CMYK, RGBA or 16-bit) is converted to RGB with PIL.
+    Args:
+        image (PIL.Image or numpy.ndarray): The image, or its pixel array.
+    Returns:
+        numpy.ndarray: An HxWx3 uint8 array.
+    """
+    @staticmethod
+    def to_rgb_array(image):
+        if isinstance(image, Image.Image):
+            # Convert images to RGB mode if they are not already in RGB (8-bit grayscale is broadcast below)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image = np.asarray(image)
+        elif image.dtype != np.uint8 or image.shape[2:] not in ((), (3,)):
+            # Arrays carry no image mode, so PIL interprets them from their dtype and shape (like Image.fromarray)
+            return np.asarray(Image.fromarray(image).convert('RGB'))
+
+        # Grayscale arrays are repeated over the 3 color channels through a broadcast view (no copy is made)
+        if image.ndim == 2:
+            return np.broadcast_to(image[:, :, np.newaxis], image.shape + (3,))
+        return image
+
+    """
+    Description:
+        Returns the cached pixel array of one of the compared images when it can be saved as it is,
+        so that it is not copied out of PIL again. This is the case for the comparer's own img1/img2
+        in RGB or L mode; any other image (or mode) is returned unchanged, to be converted by to_rgb_array.
+    Args:
+        image (PIL.Image or numpy.ndarray): The image, or its pixel array.
+    Returns:
+        PIL.Image or numpy.ndarray: The cached pixel array of the image, or the image itself.
+    """
+    def cached_array(self, image):
+        if image is self.img1 and image.mode in ('RGB', 'L'):
+            return self.img1_arr
+        if image is self.img2 and image.mode in ('RGB', 'L'):
+            return self.img2_arr
+        return image
+
     """
     Description:
         Saves the difference images that highlight the differing pixels between the two images.
         - img1_diff: Shows the original pixel values from img1 where the pixels differ from img2.
         - img2_diff: Shows the original pixel values from img2 where the pixels differ from img1.
-        - combined_diff: Shows the absolute difference between img1 and img2.
+        - combined_diff: Shows the sum of both difference images, saturated at 255.
     Args:
-        img1 (PIL.Image): The first image.
-        img2 (PIL.Image): The second image.
+        img1 (PIL.Image or numpy.ndarray): The first image (e.g. ImageCompare.img1), or its pixel array.
+        img2 (PIL.Image or numpy.ndarray): The second image (e.g. ImageCompare.img2), or its pixel array.
         mask (numpy.ndarray): A boolean mask indicating the pixels that differ.
-        output_dir (str): The directory to save the output difference images.
+        output_dir (str): The directory to save the output difference images. Defaults to the
+                          output_dir given to the constructor, which is only created on the first save.
+    Note:
+        This is an instance method (it reuses the comparer's cached pixel arrays and output directory),
+        so it is called on an ImageCompare object rather than as ImageCompare.save_difference_images.
     """
-    @staticmethod
-    def save_difference_images(img1, img2, mask, output_dir="../tests/testcase_output"):
-        os.makedirs(output_dir, exist_ok=True)
+    def save_difference_images(self, img1, img2, mask, output_dir=None):
+        if output_dir is None:
+            output_dir = self.output_dir
+            # The constructor's output directory is created once, on the first save into it
+            if not self.output_dir_created:
+                os.makedirs(output_dir, exist_ok=True)
+                self.output_dir_created = True
+        else:
+            os.makedirs(output_dir, exist_ok=True)
 
-        # Convert images to RGB mode if they are not already in RGB
-        if img1.mode != 'RGB':
-            img1 = img1.convert('RGB')
-        if img2.mode != 'RGB':
-            img2 = img2.convert('RGB')
+        # Get the RGB pixel arrays of both images for manipulation (the comparer's own RGB and grayscale
+        # images reuse their cached arrays instead of being copied out of PIL again)
+        img1_rgb = self.to_rgb_array(self.cached_array(img1))
+        img2_rgb = self.to_rgb_array(self.cached_array(img2))
 
-        # Convert the images to numpy arrays for manipulation
-        img1_rgb = np.array(img1)
-        img2_rgb = np.array(img2)
+        # HxWx1 0/1 byte view of the boolean mask, broadcast against the 3 color channels. Booleans are
+        # stored as 0/1 bytes, so viewing them as uint8 makes no copy, and both multiplications below
+        # read the same byte mask directly instead of each converting the booleans to uint8 again
+        mask3 = mask.view(np.uint8)[:, :, np.newaxis]
 
-        # Create masked images for displaying the differences
-        img1_diff = np.zeros_like(img1_rgb)  # Initialize with black (or background color)
-        img2_diff = np.zeros_like(img2_rgb)  # Initialize with black (or background color)
+        # Only keep the differing pixels with their original values in each image, black elsewhere.
+        # Multiplying by the 0/1 mask is a straight element-wise pass, cheaper than a masked selection
+        img1_diff = np.multiply(img1_rgb, mask3)  # Retain original pixels from img1 where differences occur
+        img2_diff = np.multiply(img2_rgb, mask3)  # Retain original pixels from img2 where differences occur
 
-        # Only keep the differing pixels with their original values in each image
-        img1_diff[mask] = img1_rgb[mask]  # Retain original pixels from img1 where differences occur
-        img2_diff[mask] = img2_rgb[mask]  # Retain original pixels from img2 where differences occur
+        # Combine the 2 image differences. A uint8 addition wraps around (e.g. 255 + 128 gives 127), so the
+        # sum is saturated at 255 as min(img1_diff, 255 - img2_diff) + img2_diff, which never overflows and
+        # stays in a single uint8 buffer instead of widening to uint16
+        compined_layout_array = np.subtract(np.uint8(255), img2_diff)
+        np.minimum(compined_layout_array, img1_diff, out=compined_layout_array)
+        compined_layout_array += img2_diff
 
-        # Combine the 2 image differences
-        compined_layout_array = np.add(img1_diff, img2_diff)
-        
-        # Save the images
-        Image.fromarray(img1_diff.astype(np.uint8)).save(f"{output_dir}/diff_img1.png")
-        Image.fromarray(img2_diff.astype(np.uint8)).save(f"{output_dir}/diff_img2.png")
-        Image.fromarray(compined_layout_array.astype(np.uint8)).save(f"{output_dir}/combined_diff.png")
+        # Save the images (the arrays are already uint8). These are diagnostic images, so they are
+        # written with the fastest zlib level instead of PIL's default level 6
+        Image.fromarray(img1_diff).save(f"{output_dir}/diff_img1.png", compress_level=PNG_COMPRESS_LEVEL)
+        Image.fromarray(img2_diff).save(f"{output_dir}/diff_img2.png", compress_level=PNG_COMPRESS_LEVEL)
+        Image.fromarray(compined_layout_array).save(f"{output_dir}/combined_diff.png", compress_level=PNG_COMPRESS_LEVEL)
 
     """
     Description:
@@ -3,10 +3,11 @@
 import os
 import sys
 import argparse
+import contextlib
 from PIL import Image
 from color_similarity_detection_technique import ImageCompare  # Import the ImageCompare class
 
-VALID_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')
+VALID_IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif'})
 
 """
     Description:
@@ -27,7 +28,8 @@ def parse_arguments(args=None):
     Args:
         file_path (str): The file path to validate.
     Returns:
-        str: The validated file path.
+        PIL.Image: The opened image. Only its header has been read, so it can be passed
+                   on to ImageCompare without opening the file again.
     Raises:
         argparse.ArgumentTypeError: If the file does not exist or the format is invalid.
 """
@@ -36,19 +38,18 @@ def check_image_file_format_validity(file_path):
     if not os.path.isfile(file_path):
         raise argparse.ArgumentTypeError(f"File '{file_path}' does not exist.")
     
-    # Check if the file has a valid image extension
-    if not file_path.lower().endswith(VALID_IMAGE_EXTENSIONS):
+    # Check if the file has a valid image extension (a single set lookup on the lowercased extension)
+    if os.path.splitext(file_path)[1].lower() not in VALID_IMAGE_EXTENSIONS:
         raise argparse.ArgumentTypeError(f"File '{file_path}' is not a valid image format.")
     
     # Open the image to check if it's a valid image
     try:
-        with Image.open(file_path) as img:
-            img_format = img.format  # This can be stored or used if needed
+        img = Image.open(file_path)
     except Exception as e:
         raise argparse.ArgumentTypeError(f"Could not open image '{file_path}'. Error: {e}")
 
-    # Return only the file path (not a tuple) for further processing
-    return file_path
+    # Return the opened image so its format and pixels can be used without reopening the file
+    return img
    
 
 """
@@ -82,31 +83,29 @@ def main(args=None):
         args = sys.argv[1:]  # Take arguments from sys.argv if no args are passed
     parsed_args = parse_arguments(args)
     
-    # Validate the image paths (now returns only the paths, not a tuple)
-    img1_path = check_image_file_format_validity(parsed_args.img1)
-    img2_path = check_image_file_format_validity(parsed_args.img2)
+    # Every image opened below is closed when the block exits, whether the comparison
+    # completes or a later check (second image, formats, tolerance value) fails
+    with contextlib.ExitStack() as opened_images:
+        # Validate the image paths (each file is opened once here and reused below)
+        img1 = opened_images.enter_context(check_image_file_format_validity(parsed_args.img1))
+        img2 = opened_images.enter_context(check_image_file_format_validity(parsed_args.img2))
 
-    # Open images to check formats
-    with Image.open(img1_path) as img1, Image.open(img2_path) as img2:
-        img1_format = img1.format
-        img2_format = img2.format
-    
-    # Check if the two image formats are the same
-    if img1_format != img2_format:
-        raise argparse.ArgumentTypeError(f"Image formats do not match: '{img1_format}' vs '{img2_format}'")
-     
-    # Check on tolerance value
-    parsed_args.tolerance_value = check_tolerance_value_validity(parsed_args.tolerance_value)
-    
-    comparer = ImageCompare(parsed_args.img1, parsed_args.img2, parsed_args.tolerance_value)
-    
-    print(f"Comparing Image 1: {parsed_args.img1}")
-    print(f"Comparing Image 2: {parsed_args.img2}")
-    print(f"Tolerance Value: {parsed_args.tolerance_value}%")
+        # Check if the two image formats are the same
+        if img1.format != img2.format:
+            raise argparse.ArgumentTypeError(f"Image formats do not match: '{img1.format}' vs '{img2.format}'")
+         
+        # Check on tolerance value
+        parsed_args.tolerance_value = check_tolerance_value_validity(parsed_args.tolerance_value)
+        
+        comparer = ImageCompare(img1, img2, parsed_args.tolerance_value)
+        
+        print(f"Comparing Image 1: {parsed_args.img1}")
+        print(f"Comparing Image 2: {parsed_args.img2}")
+        print(f"Tolerance Value: {parsed_args.tolerance_value}%")
 
-    mask, num_differences, total_pixels = comparer.compare_images()
-    comparer.save_difference_images(comparer.img1, comparer.img2, mask)
-    comparer.generate_report(num_differences, total_pixels, parsed_args.tolerance_value)
+        mask, num_differences, total_pixels = comparer.compare_images()
+        comparer.save_difference_images(comparer.img1, comparer.img2, mask)
+        comparer.generate_report(num_differences, total_pixels, parsed_args.tolerance_value)
 
 if __name__ == "__main__":
     main()